@@ -1,15 +1,17 @@
 from __future__ import annotations
-import os, sqlite3
-from contextlib import closing
-from functools import wraps
+import atexit, hashlib, json, os, re, shutil, sqlite3, threading, time
+from contextlib import closing, contextmanager
+from functools import lru_cache, wraps
 from pathlib import Path
+from urllib.parse import quote
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
 
 from flask import (
-    Flask, g, render_template, request, redirect, url_for,
-    flash, jsonify, send_from_directory, session
+    Flask, render_template, request, redirect, url_for,
+    Response, flash, jsonify, send_from_directory, session
 )
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -23,30 +25,133 @@ try:
 except ZoneInfoNotFoundError:
     raise RuntimeError("Time zone data not found. In your venv: pip install tzdata")
 
+# `python app.py` or FLASK_ENV=development / FLASK_DEBUG=1 keep the edit-and-refresh setup
+DEV_MODE = (__name__ == "__main__"
+            or os.getenv("FLASK_ENV") == "development"
+            or os.getenv("FLASK_DEBUG") == "1")
+
 app = Flask(__name__, template_folder="templates", static_folder="static", static_url_path="/static")
 app.config.update(
     SECRET_KEY=os.getenv("SECRET_KEY", "dev-secret"),
-    TEMPLATES_AUTO_RELOAD=True,
-    SEND_FILE_MAX_AGE_DEFAULT=0,
+    TEMPLATES_AUTO_RELOAD=DEV_MODE,
+    # static/media names aren't fingerprinted, so cache for a day rather than a year
+    SEND_FILE_MAX_AGE_DEFAULT=0 if DEV_MODE else int(os.getenv("STATIC_MAX_AGE", "86400")),
 )
+if not DEV_MODE:
+    # Keep compiled template bytecode across worker restarts
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache()}
+
+# ---- Media offload to the front-end server ----
+# Apache (mod_xsendfile) / lighttpd: set USE_X_SENDFILE=1.
+# nginx: set X_ACCEL_MEDIA_PREFIX to an `internal;` location aliased to MEDIA_DIR,
+#   e.g. location /_media/ { internal; alias /path/to/media/; }
+X_ACCEL_MEDIA_PREFIX = os.getenv("X_ACCEL_MEDIA_PREFIX", "")
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE") == "1" or bool(X_ACCEL_MEDIA_PREFIX)
+
+# A 6-digit PIN behind a session doesn't need Werkzeug's 600k-round default.
+PIN_HASH_METHOD = "pbkdf2:sha256:50000"
 
-ALLOWED_EXT = {".png",".jpg",".jpeg",".gif",".webp",".mp4",".webm",".ogg",".m4v",".mov"}
+UPLOAD_CHUNK = 1024 * 1024  # bytes per read/write when saving uploads
+EVICT_UPLOAD_MIN = 8 * 1024 * 1024  # uploads this big (videos) are dropped from the page cache
+
+ALLOWED_EXT = frozenset({".png",".jpg",".jpeg",".gif",".webp",".mp4",".webm",".ogg",".m4v",".mov"})
 
 # ---------------- DB ----------------
-def get_db():
-    db = getattr(g, "_db", None)
-    if db is None:
-        need_init = not os.path.exists(DB_PATH)
-        db = g._db = sqlite3.connect(DB_PATH)
-        db.row_factory = sqlite3.Row
-
-        # Ensure settings infra exists on EVERY startup (works for old DBs too)
-        _ensure_settings_table(db)
-        _ensure_display_default(db)
-        _ensure_admin_pin(db)
-
-        if need_init:
-            db.executescript("""
+# One long-lived connection per worker process: avoids the open/close cost per
+# request and keeps SQLite's page cache warm. It is opened lazily in the process
+# that uses it, so a `gunicorn --preload` master never hands one to its forked
+# workers. Writes go through db_write() below.
+_write_lock = threading.Lock()
+_connect_lock = threading.Lock()
+_db: sqlite3.Connection | None = None
+_db_pid = 0
+_db_ready = False
+
+def _connect() -> sqlite3.Connection:
+    db = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    _enable_wal(db)
+    db.executescript("""
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    """)
+    return db
+
+def _enable_wal(db: sqlite3.Connection):
+    # WAL is persistent, so this only converts on the very first boot. That switch
+    # can return SQLITE_BUSY without going through the busy handler when several
+    # workers start together, hence the retry.
+    for _ in range(100):  # ~5 s, like the default busy timeout
+        try:
+            if db.execute("PRAGMA journal_mode=WAL").fetchone()[0] == "wal":
+                return
+        except sqlite3.OperationalError:
+            pass
+        time.sleep(0.05)
+    db.execute("PRAGMA journal_mode=WAL")  # last attempt; let the error surface
+
+def get_db() -> sqlite3.Connection:
+    global _db, _db_pid
+    pid = os.getpid()
+    if _db is None or _db_pid != pid:
+        with _connect_lock:
+            if _db is None or _db_pid != pid:
+                # A connection inherited across fork is left alone, never used or closed
+                _db, _db_pid = _connect(), pid
+    return _db
+
+def _reset_after_fork():
+    global _write_lock, _connect_lock
+    _write_lock = threading.Lock()
+    _connect_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+# Refresh planner stats as the table grows (SQLite suggests PRAGMA optimize
+# periodically on long-lived connections and at close).
+OPTIMIZE_EVERY = 500
+_writes_since_optimize = 0
+
+@contextmanager
+def db_write():
+    """Serialise a write on the shared connection; runs PRAGMA optimize every N writes."""
+    global _writes_since_optimize
+    with _write_lock:
+        db = get_db()
+        yield db
+        _writes_since_optimize += 1
+        if _writes_since_optimize >= OPTIMIZE_EVERY:
+            _writes_since_optimize = 0
+            db.execute("PRAGMA optimize")
+
+@atexit.register
+def _optimize_on_exit():
+    if _db is None or _db_pid != os.getpid():
+        return  # nothing opened by this process (e.g. a preloading master)
+    # No _write_lock here: a thread stuck mid-write must not hang shutdown.
+    # SQLite serialises the connection itself, and a failure is harmless.
+    try:
+        _db.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+
+def init_db():
+    """Create / migrate the schema. Runs at import in every worker, so the whole
+    bootstrap is one BEGIN IMMEDIATE transaction: concurrent workers queue on
+    SQLite's write lock and each sees the schema the previous one left."""
+    global _db_ready
+    if _db_ready:
+        return
+    # Short-lived connection: importing (possibly in a preloading master) must
+    # not leave the shared connection open.
+    with closing(_connect()) as db:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            _ensure_settings_table(db)
+            _ensure_display_default(db)
+            _ensure_admin_pin(db)
+            db.execute("""
             CREATE TABLE IF NOT EXISTS waitlist (
               id          INTEGER PRIMARY KEY AUTOINCREMENT,
               name        TEXT    NOT NULL,
@@ -55,14 +160,23 @@ def get_db():
               notes       TEXT,
               status      TEXT    NOT NULL DEFAULT 'WAITING',
               requesttime TEXT    NOT NULL DEFAULT (datetime('now'))  -- UTC
-            );
-            CREATE INDEX IF NOT EXISTS idx_waitlist_status  ON waitlist(status);
-            CREATE INDEX IF NOT EXISTS idx_waitlist_request ON waitlist(requesttime);
+            )
             """)
-            db.commit()
-
-        _ensure_lifecycle_columns(db)
-    return db
+            db.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_status  ON waitlist(status)")
+            _ensure_lifecycle_columns(db)
+            # requesttime is stored as '%Y-%m-%d %H:%M:%S' UTC, so plain text order is
+            # chronological. Partial index over just the live rows, in time order, so
+            # home/api_waitlist scan it without a sort and never touch history.
+            db.execute("""
+              CREATE INDEX IF NOT EXISTS idx_waitlist_live ON waitlist(requesttime)
+              WHERE status IN ('WAITING','ASSIGNING') AND deleted_at IS NULL
+            """)
+            _ensure_requesttime_epoch(db)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    _db_ready = True
 
 def _ensure_settings_table(db: sqlite3.Connection):
     db.execute("""
@@ -71,54 +185,78 @@ def _ensure_settings_table(db: sqlite3.Connection):
         value TEXT
       );
     """)
-    db.commit()
 
 def _ensure_display_default(db: sqlite3.Connection):
     db.execute("INSERT OR IGNORE INTO settings(key,value) VALUES('display_mode','open')")
-    db.commit()
 
 def _ensure_admin_pin(db: sqlite3.Connection):
     # If no admin_pin_hash set, initialize from env or default 123456
     row = db.execute("SELECT value FROM settings WHERE key='admin_pin_hash'").fetchone()
     if not row or not row["value"]:
         pin = os.getenv("ADMIN_PIN", "123456").strip()
-        h   = generate_password_hash(pin)
+        h   = generate_password_hash(pin, method=PIN_HASH_METHOD)
         db.execute("INSERT INTO settings(key,value) VALUES('admin_pin_hash', ?) "
                    "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (h,))
-        db.commit()
+
+LIFECYCLE_COLUMNS = (
+    ("requested_at", "requested_at TEXT"),
+    ("assigned_at",  "assigned_at  TEXT"),
+    ("seated_at",    "seated_at    TEXT"),
+    ("deleted_at",   "deleted_at   TEXT"),
+)
 
 def _ensure_lifecycle_columns(db: sqlite3.Connection):
-    for coldef in [
-        "requested_at TEXT",
-        "assigned_at  TEXT",
-        "seated_at    TEXT",
-        "deleted_at   TEXT"
-    ]:
-        try:
+    # Diff against the live schema instead of probing with ALTERs that fail.
+    # The check and the ALTERs are only atomic inside init_db's BEGIN IMMEDIATE;
+    # outside it a concurrently booting worker can add the column in between.
+    if not db.in_transaction:
+        raise RuntimeError("_ensure_lifecycle_columns must run inside init_db's transaction")
+    cols = {r["name"] for r in db.execute("PRAGMA table_info(waitlist)")}
+    for name, coldef in LIFECYCLE_COLUMNS:
+        if name not in cols:
             db.execute(f"ALTER TABLE waitlist ADD COLUMN {coldef}")
-            db.commit()
-        except sqlite3.OperationalError:
-            pass
 
-@app.teardown_appcontext
-def close_db(_):
-    db = getattr(g, "_db", None)
-    if db is not None:
-        db.close()
+def _ensure_requesttime_epoch(db: sqlite3.Connection):
+    # requesttime as unix seconds: sorts natively and formats without parsing.
+    # A VIRTUAL generated column can't drift from requesttime and needs no
+    # backfill; the TEXT column stays for compatibility.
+    cols = {r["name"] for r in db.execute("PRAGMA table_xinfo(waitlist)")}
+    if "requesttime_epoch" not in cols:
+        db.execute("""
+          ALTER TABLE waitlist ADD COLUMN requesttime_epoch INTEGER
+          GENERATED ALWAYS AS (CAST(strftime('%s', requesttime) AS INTEGER)) VIRTUAL
+        """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_request_epoch ON waitlist(requesttime_epoch)")
+    # The admin view reads requesttime_epoch now; the TEXT index has no reader
+    db.execute("DROP INDEX IF EXISTS idx_waitlist_request")
+
+init_db()
 
 # ------------- Settings helpers -------------
+# Process-local cache: key -> (expires_at, value). Invalidated by set_setting;
+# the TTL bounds staleness when another worker process changes a setting.
+SETTINGS_TTL = 5.0
+_settings_cache: dict[str, tuple[float, str | None]] = {}
+
 def get_setting(key: str, default: str = "") -> str:
-    row = get_db().execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
-    return row["value"] if row and row["value"] is not None else default
+    now = time.monotonic()
+    hit = _settings_cache.get(key)
+    if hit and hit[0] > now:
+        value = hit[1]
+    else:
+        row = get_db().execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+        value = row["value"] if row else None
+        _settings_cache[key] = (now + SETTINGS_TTL, value)
+    return value if value is not None else default
 
 def set_setting(key: str, value: str):
-    db = get_db()
-    db.execute(
-        "INSERT INTO settings(key,value) VALUES(?,?) "
-        "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-        (key, value)
-    )
-    db.commit()
+    with db_write() as db:
+        db.execute(
+            "INSERT INTO settings(key,value) VALUES(?,?) "
+            "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, value)
+        )
+    _settings_cache.pop(key, None)
 
 # ------------- Auth helpers -------------
 def is_admin() -> bool:
@@ -143,36 +281,74 @@ def inject_globals():
     return {"display_mode": mode, "is_admin": is_admin()}
 
 # ---------------- Utils ----------------
+_PHONE_STRIP_RE = re.compile(r"[^\d+]")
+
 def normalize_phone(p: str) -> str:
-    return "".join(ch for ch in (p or "") if ch.isdigit() or ch == "+")
-
-def fetch_media_files():
-    items = []
-    if os.path.isdir(MEDIA_DIR):
-        for fn in sorted(os.listdir(MEDIA_DIR)):
-            if fn.startswith("."):
-                continue
-            ext = os.path.splitext(fn)[1].lower()
-            if ext in ALLOWED_EXT:
-                items.append(fn)
-    return items
-
-def utc_now_str() -> str:
-    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-
-def utc_str_to_et(ts: str) -> str:
-    if not ts: return ""
-    dt_utc = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-    return dt_utc.astimezone(EASTERN).strftime("%Y-%m-%d %H:%M:%S %Z")
+    return _PHONE_STRIP_RE.sub("", p or "")
+
+def file_ext(name: str) -> str:
+    """Lower-cased extension incl. the dot; same result as os.path.splitext."""
+    stem, dot, ext = name.rpartition(".")
+    return "." + ext.lower() if dot and stem.strip(".") else ""
+
+# Media listing memoised on MEDIA_DIR's mtime; upload/delete also reset it.
+_MEDIA_SUFFIXES = tuple(ALLOWED_EXT)  # str.endswith takes a tuple
+# (mtime_ns, files) swapped in one assignment so threads never see a mixed pair
+_media_cache: tuple[int, tuple[str, ...]] = (-1, ())
+
+def fetch_media_files() -> tuple[str, ...]:
+    global _media_cache
+    try:
+        mtime = os.stat(MEDIA_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return ()
+    cached_mtime, cached_files = _media_cache
+    if mtime == cached_mtime:
+        return cached_files
+    with os.scandir(MEDIA_DIR) as it:
+        names = [e.name for e in it
+                 if not e.name.startswith(".")
+                 and e.name.lower().endswith(_MEDIA_SUFFIXES)
+                 and e.is_file()]
+    names.sort()
+    files = tuple(names)
+    _media_cache = (mtime, files)
+    return files
+
+def _invalidate_media_cache():
+    global _media_cache
+    _media_cache = (-1, ())
+
+def make_etag(*parts) -> str:
+    """Short validator for the poll endpoints; parts must have a stable repr()."""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+def not_modified(etag: str) -> Response | None:
+    """304 response if the client already holds `etag`, else None."""
+    if not request.if_none_match.contains(etag):
+        return None
+    return Response(status=304)
+
+@lru_cache(maxsize=1024)
+def _et_offset(utc_hour: int) -> tuple[int, str]:
+    # US DST switches happen on whole UTC hours, so the offset is fixed per hour
+    dt = datetime.fromtimestamp(utc_hour * 3600, tz=EASTERN)
+    return int(dt.utcoffset().total_seconds()), dt.tzname()
+
+@lru_cache(maxsize=4096)  # the same timestamps come back on every poll
+def epoch_to_et(ts: int | None) -> str:
+    if ts is None: return ""
+    offset, abbr = _et_offset(ts // 3600)
+    return time.strftime("%Y-%m-%d %H:%M:%S ", time.gmtime(ts + offset)) + abbr
 
 @app.template_filter("est")
-def jinja_est(ts: str) -> str:
-    return utc_str_to_et(ts)
+def jinja_est(ts: int | None) -> str:
+    return epoch_to_et(ts)
 
 def et_bounds_for(date_str: str | None):
     """
-    Given YYYY-MM-DD (in Eastern), return that day's UTC [start,end) strings
-    matching the DB '%Y-%m-%d %H:%M:%S' format. Defaults to today ET.
+    Given YYYY-MM-DD (in Eastern), return that day's [start,end) bounds as
+    unix seconds, matching requesttime_epoch. Defaults to today ET.
     """
     if not date_str:
         date_str = datetime.now(EASTERN).strftime('%Y-%m-%d')
@@ -181,9 +357,7 @@ def et_bounds_for(date_str: str | None):
     start_et = datetime(d.year, d.month, d.day, 0, 0, 0, tzinfo=EASTERN)
     end_et   = start_et + timedelta(days=1)
 
-    start_utc = start_et.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-    end_utc   = end_et.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-    return date_str, start_utc, end_utc
+    return date_str, int(start_et.timestamp()), int(end_et.timestamp())
 
 # ---------------- Pages ----------------
 @app.get("/")
@@ -193,7 +367,7 @@ def home():
         rows = get_db().execute("""
           SELECT * FROM waitlist
           WHERE status IN ('WAITING','ASSIGNING') AND deleted_at IS NULL
-          ORDER BY datetime(requesttime) ASC
+          ORDER BY requesttime ASC
           LIMIT 100
         """).fetchall()
     return render_template("home.html",
@@ -218,14 +392,13 @@ def add_waitlist_submit():
         flash("Enter name, valid phone, and seats (>0).", "error")
         return redirect(url_for("add_waitlist_form"))
 
-    now_utc = utc_now_str()
-    db = get_db()
-    with closing(db.cursor()) as cur:
+    # requesttime takes its datetime('now') default (requesttime_epoch is set by
+    # trigger); 'now' is fixed within a statement
+    with db_write() as db, closing(db.cursor()) as cur:
         cur.execute("""
-            INSERT INTO waitlist (name, phone, seats, notes, status, requesttime, requested_at)
-            VALUES (?, ?, ?, ?, 'WAITING', ?, ?)
-        """, (name, phone, seats, notes, now_utc, now_utc))
-    db.commit()
+            INSERT INTO waitlist (name, phone, seats, notes, status, requested_at)
+            VALUES (?, ?, ?, ?, 'WAITING', CURRENT_TIMESTAMP)
+        """, (name, phone, seats, notes))
     flash("Party added to waitlist.", "success")
     return redirect(url_for("home"))
 
@@ -235,15 +408,15 @@ def add_waitlist_submit():
 def waitlist_admin():
     # ET date filter
     date_str = request.args.get("d")
-    selected_date, start_utc, end_utc = et_bounds_for(date_str)
+    selected_date, start_ts, end_ts = et_bounds_for(date_str)
 
     rows = get_db().execute("""
       SELECT * FROM waitlist
       WHERE deleted_at IS NULL
-        AND datetime(requesttime) >= datetime(?)
-        AND datetime(requesttime) <  datetime(?)
-      ORDER BY datetime(requesttime) ASC
-    """, (start_utc, end_utc)).fetchall()
+        AND requesttime_epoch >= ?
+        AND requesttime_epoch <  ?
+      ORDER BY requesttime_epoch ASC
+    """, (start_ts, end_ts)).fetchall()
 
     return render_template("waitlist_admin.html", rows=rows, selected_date=selected_date)
 
@@ -256,42 +429,36 @@ def media_manage():
 @app.post("/waitlist/<int:item_id>/assign")
 @admin_required
 def waitlist_assign(item_id: int):
-    now_utc = utc_now_str()
-    db = get_db()
-    db.execute("""
-        UPDATE waitlist
-        SET status='ASSIGNING',
-            assigned_at = ?
-        WHERE id=? AND deleted_at IS NULL
-    """, (now_utc, item_id))
-    db.commit()
+    with db_write() as db:
+        db.execute("""
+            UPDATE waitlist
+            SET status='ASSIGNING',
+                assigned_at = CURRENT_TIMESTAMP
+            WHERE id=? AND deleted_at IS NULL
+        """, (item_id,))
     return redirect(request.referrer or url_for("waitlist_admin"))
 
 @app.post("/waitlist/<int:item_id>/seated")
 @admin_required
 def waitlist_seated(item_id: int):
-    now_utc = utc_now_str()
-    db = get_db()
-    db.execute("""
-        UPDATE waitlist
-        SET status='SEATED',
-            seated_at = COALESCE(seated_at, ?)
-        WHERE id=? AND deleted_at IS NULL
-    """, (now_utc, item_id))
-    db.commit()
+    with db_write() as db:
+        db.execute("""
+            UPDATE waitlist
+            SET status='SEATED',
+                seated_at = COALESCE(seated_at, CURRENT_TIMESTAMP)
+            WHERE id=? AND deleted_at IS NULL
+        """, (item_id,))
     return redirect(request.referrer or url_for("waitlist_admin"))
 
 @app.post("/waitlist/<int:item_id>/delete")
 @admin_required
 def waitlist_delete(item_id: int):
-    now_utc = utc_now_str()
-    db = get_db()
-    db.execute("""
-        UPDATE waitlist
-        SET deleted_at = ?
-        WHERE id=? AND deleted_at IS NULL
-    """, (now_utc, item_id))
-    db.commit()
+    with db_write() as db:
+        db.execute("""
+            UPDATE waitlist
+            SET deleted_at = CURRENT_TIMESTAMP
+            WHERE id=? AND deleted_at IS NULL
+        """, (item_id,))
     flash("Entry removed.", "success")
     return redirect(request.referrer or url_for("waitlist_admin"))
 
@@ -311,16 +478,23 @@ def display_stop():
     return redirect(request.referrer or url_for("waitlist_admin"))
 
 # ---- Admin auth ----
+# Resolved once; render_template still applies context processors and flashes.
+# Dev mode keeps the name so template edits are picked up.
+_TPL_ADMIN_LOGIN = "admin_login.html" if DEV_MODE else app.jinja_env.get_template("admin_login.html")
+
 @app.get("/admin/login")
 def admin_login():
-    return render_template("admin_login.html", next=request.args.get("next") or "")
+    return render_template(_TPL_ADMIN_LOGIN, next=request.args.get("next") or "")
 
 @app.post("/admin/login")
 def admin_login_post():
     pin = (request.form.get("pin") or "").strip()
     next_url = request.form.get("next") or url_for("waitlist_admin")
-    row = get_db().execute("SELECT value FROM settings WHERE key='admin_pin_hash'").fetchone()
-    if row and check_password_hash(row["value"], pin):
+    pin_hash = get_setting("admin_pin_hash")
+    if pin_hash and check_password_hash(pin_hash, pin):
+        if not pin_hash.startswith(PIN_HASH_METHOD + "$"):
+            # Re-hash PINs stored with the old (slower) default parameters
+            set_setting("admin_pin_hash", generate_password_hash(pin, method=PIN_HASH_METHOD))
         session["is_admin"] = True
         flash("Logged in as admin.", "success")
         return redirect(next_url)
@@ -336,26 +510,51 @@ def admin_logout():
 # --------------- JSON for live panel ---------------
 @app.get("/api/waitlist")
 def api_waitlist():
-    rows = get_db().execute("""
-      SELECT id, name, phone, seats, status, requesttime, assigned_at
+    db = get_db()
+    # Any add / assign / seat / delete changes one of these, so most polls stop here
+    sig = db.execute("""
+      SELECT IFNULL(MAX(id), 0),
+             IFNULL(MAX(COALESCE(assigned_at, requesttime)), ''),
+             COUNT(*),
+             TOTAL(status = 'ASSIGNING')
       FROM waitlist
       WHERE status IN ('WAITING','ASSIGNING') AND deleted_at IS NULL
-      ORDER BY datetime(requesttime) ASC
+    """).fetchone()
+    etag = make_etag(*sig)
+    # Plain json.dumps skips jsonify's key sorting / pretty-print checks
+    resp = not_modified(etag) or Response(_live_waitlist_json(db), mimetype="application/json")
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = True
+    return resp
+
+def _live_waitlist_json(db: sqlite3.Connection) -> str:
+    rows = db.execute("""
+      SELECT id, name, phone, seats, status, requesttime, assigned_at,
+             requesttime_epoch,
+             COALESCE(CASE WHEN status='ASSIGNING' THEN assigned_at END, requesttime) || 'Z'
+               AS timer_start_utc
+      FROM waitlist
+      WHERE status IN ('WAITING','ASSIGNING') AND deleted_at IS NULL
+      ORDER BY requesttime ASC
       LIMIT 100
     """).fetchall()
-    out = []
-    for r in rows:
-        start_ts = r["assigned_at"] if (r["status"] == "ASSIGNING" and r["assigned_at"]) else r["requesttime"]
-        d = dict(r)
-        d["timer_start_utc"] = (start_ts or r["requesttime"]) + "Z"
-        d["requesttime_et"]  = utc_str_to_et(r["requesttime"])
-        out.append(d)
-    return jsonify(out)
+    out = [
+        {"id": i, "name": n, "phone": p, "seats": s, "status": st,
+         "requesttime": rt, "assigned_at": at, "timer_start_utc": ts,
+         "requesttime_et": epoch_to_et(ep)}
+        for i, n, p, s, st, rt, at, ep, ts in rows
+    ]
+    return json.dumps(out, separators=(",", ":"))
 
 # --------------- Media ----------------
 @app.get("/media/<path:filename>")
 def media(filename: str):
-    return send_from_directory(MEDIA_DIR, filename, as_attachment=False)
+    resp = send_from_directory(MEDIA_DIR, filename, as_attachment=False)
+    if X_ACCEL_MEDIA_PREFIX and "X-Sendfile" in resp.headers:
+        # nginx only understands X-Accel-Redirect (a URI, not a filesystem path)
+        del resp.headers["X-Sendfile"]
+        resp.headers["X-Accel-Redirect"] = X_ACCEL_MEDIA_PREFIX + quote(filename)
+    return resp
 
 @app.post("/upload")
 @admin_required
@@ -364,22 +563,41 @@ def upload():
     if not f or f.filename == "":
         flash("No file selected.", "error")
         return redirect(url_for("media_manage"))
-    filename = secure_filename(os.path.basename(f.filename))
-    ext = os.path.splitext(filename)[1].lower()
-    if ext not in ALLOWED_EXT:
+    filename = secure_filename(f.filename)  # also neutralises path separators
+    if file_ext(filename) not in ALLOWED_EXT:
         flash("Unsupported file type.", "error")
         return redirect(url_for("media_manage"))
     os.makedirs(MEDIA_DIR, exist_ok=True)
-    f.save(os.path.join(MEDIA_DIR, filename))
+    dest = os.path.join(MEDIA_DIR, filename)
+    with open(dest, "wb") as dst:
+        shutil.copyfileobj(f.stream, dst, UPLOAD_CHUNK)
+        size = dst.tell()
+    if size >= EVICT_UPLOAD_MIN and hasattr(os, "posix_fadvise"):
+        # Sync + evict off the request thread so the redirect isn't held up
+        threading.Thread(target=_evict_from_page_cache, args=(dest,), daemon=True).start()
+    _invalidate_media_cache()
     flash("File uploaded.", "success")
     return redirect(url_for("media_manage"))
 
+def _evict_from_page_cache(path: str):
+    """Drop a large upload from the page cache so it doesn't push out the DB pages."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # deleted/replaced meanwhile
+    try:
+        os.fdatasync(fd)  # DONTNEED only drops clean pages
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
 # ---- Media delete (Admin-only) ----
 def _safe_media_path(filename: str) -> Path:
     # Only allow plain filenames (no dirs) and known extensions
     name = os.path.basename(filename)
-    ext = os.path.splitext(name)[1].lower()
-    if ext not in ALLOWED_EXT:
+    if file_ext(name) not in ALLOWED_EXT:
         raise ValueError("Unsupported file type")
     return Path(MEDIA_DIR) / name
 
@@ -396,6 +614,7 @@ def media_delete():
     try:
         if p.exists():
             p.unlink()
+            _invalidate_media_cache()
             flash(f"Deleted {p.name}.", "success")
         else:
             flash("File not found.", "error")
@@ -408,13 +627,19 @@ def media_delete():
 @app.get("/status")
 def status_api():
     row = get_db().execute("SELECT COUNT(*) AS c FROM waitlist WHERE deleted_at IS NULL").fetchone()
-    return jsonify({
+    payload = {
         "ok": True,
         "waitlist_count": row["c"],
         "media_count": len(fetch_media_files()),
         "display_mode": get_setting("display_mode","open"),
         "is_admin": is_admin()
-    })
+    }
+    etag = make_etag(*payload.values())
+    resp = not_modified(etag) or jsonify(payload)
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = True
+    resp.vary.add("Cookie")  # is_admin depends on the session
+    return resp
 
 if __name__ == "__main__":
     app.run(debug=True)